@@ -1,32 +1,84 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
 import time
 import logging
 import subprocess
-from datetime import datetime
+from contextlib import contextmanager
+from urllib.parse import urljoin
 
-from fangtang_push import sc_send
+from core import get_session, lazy_import, setup_logging
+from fangtang_push import get_outbox, sc_enqueue
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler(f'cmhk_buyer_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
-    ]
-)
+# 第三方依赖延迟导入，首次使用时才加载
+webdriver = lazy_import('selenium.webdriver')
+chrome_service = lazy_import('selenium.webdriver.chrome.service')
+by = lazy_import('selenium.webdriver.common.by')
+ui = lazy_import('selenium.webdriver.support.ui')
+EC = lazy_import('selenium.webdriver.support.expected_conditions')
+exceptions = lazy_import('selenium.common.exceptions')
+requests = lazy_import('requests')
+bs4 = lazy_import('bs4')
+
+# 购买流程的计时步骤，按执行顺序排列
+STEPS = ["page_load", "buy_click", "config_page", "cart", "checkout", "submit"]
+
+# 精简浏览器配置下屏蔽的资源（图片和字体）
+BLOCKED_RESOURCES = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+                     "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+
+CART_URL = "https://cmhk.io/cart.php?gid={gid}"
+POLL_WORKERS = 4  # 库存轮询的线程数和连接数上限，与监控的产品数量无关
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36'
+
+def make_product(gid, index=1):
+    """
+    构造要监控的产品
+    :param gid: 产品组ID（cart.php?gid=...）
+    :param index: 产品在组页面中的序号，对应按钮 product{index}-order-button
+    """
+    return {
+        "name": f"gid={gid} product{index}",
+        "url": CART_URL.format(gid=gid),
+        "order_button_id": f"product{index}-order-button"
+    }
+
+def parse_product(spec):
+    """解析命令行中的产品参数 GID[:N]，供 argparse 的 type 使用"""
+    gid, _, index = spec.partition(':')
+    try:
+        return make_product(int(gid), int(index or 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的产品参数 '{spec}'，格式应为 GID[:N]，例如 1 或 2:3")
 
 class CMHKBuyer:
-    def __init__(self):
+    def __init__(self, products=None, lean=False):
+        """
+        初始化抢购器
+        :param products: 要同时监控的产品列表（见 make_product），默认为 CMHK NAT 产品
+        :param lean: 使用精简浏览器配置（无头模式、eager页面加载策略、屏蔽图片和字体）
+        """
         self.driver = None
-        self.target_url = "https://cmhk.io/cart.php?gid=1"  # CMHK NAT产品页面
+        self.lean = lean
+        self.session = None
+        self.products = products or [make_product(1)]  # 默认为 CMHK NAT 产品页面
+        self.purchased = set()  # 已下单的产品名称
+        self.out_of_stock_marker = "缺货"  # 点击购买按钮后出现的缺货页面标题
+        self.cookies = [
+            {
+                "name": "WHMCSy551iLvnhYt7",
+                "value": "7i2u34p73ospgjao58vni5ch9j"
+            },
+            {
+                "name": "WHMCSUser",
+                "value": "181%3A%3Aaedd68e8b937b208d304dc06260fc89b9efe28ed"
+            }
+        ]
         self.attempt_count = 0
+        self.poll_count = 0
         self.max_retries = 3  # 连续失败最大重试次数
+        self.step_timings = {}  # 各步骤耗时（毫秒）
 
     def setup_driver(self):
         """设置Chrome浏览器驱动"""
@@ -35,10 +87,16 @@ class CMHKBuyer:
             chromedriver_path = subprocess.check_output(['which', 'chromedriver']).decode().strip()
             
             options = webdriver.ChromeOptions()
-            # options.add_argument('--headless')  # 无头模式，取消注释以启用
+            if self.lean:
+                # DOM就绪即返回，不等待图片等子资源
+                options.page_load_strategy = 'eager'
+                options.add_argument('--headless=new')
+                options.add_experimental_option('prefs', {
+                    'profile.managed_default_content_settings.images': 2
+                })
             
             # 设置User-Agent
-            options.add_argument('user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36')
+            options.add_argument(f'user-agent={USER_AGENT}')
             
             # 添加其他请求头
             options.add_argument('accept=text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7')
@@ -48,12 +106,15 @@ class CMHKBuyer:
             options.add_argument('sec-ch-ua-platform="macOS"')
             
             # 创建Service对象
-            service = Service(executable_path=chromedriver_path)
+            service = chrome_service.Service(executable_path=chromedriver_path)
             
             # 使用Service对象创建driver
             self.driver = webdriver.Chrome(service=service, options=options)
-            self.driver.implicitly_wait(10)
-            logging.info("Chrome浏览器启动成功")
+            if self.lean:
+                # 通过CDP屏蔽图片和字体请求
+                self.driver.execute_cdp_cmd('Network.enable', {})
+                self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_RESOURCES})
+            logging.info(f"Chrome浏览器启动成功（{'精简' if self.lean else '标准'}配置）")
             
         except Exception as e:
             logging.error(f"设置Chrome驱动失败: {str(e)}")
@@ -66,18 +127,7 @@ class CMHKBuyer:
             self.driver.get("https://cmhk.io")
             
             # 设置cookies
-            cookies = [
-                {
-                    "name": "WHMCSy551iLvnhYt7",
-                    "value": "7i2u34p73ospgjao58vni5ch9j"
-                },
-                {
-                    "name": "WHMCSUser",
-                    "value": "181%3A%3Aaedd68e8b937b208d304dc06260fc89b9efe28ed"
-                }
-            ]
-            
-            for cookie in cookies:
+            for cookie in self.cookies:
                 self.driver.add_cookie(cookie)
             
             logging.info("Cookies设置成功")
@@ -86,143 +136,263 @@ class CMHKBuyer:
             logging.error(f"设置Cookies失败: {str(e)}")
             return False
 
-    def check_and_buy(self):
-        """检查产品是否可购买并尝试购买"""
+    def setup_session(self):
+        """
+        创建用于轮询库存的HTTP会话（保持连接）
+        会话不携带用户cookies：请求购买链接会修改WHMCS会话中的购物车，
+        匿名会话可以得到缺货页面而不影响用户的购物车
+        """
+        # 所有产品共用一个会话，连接池大小与轮询线程数一致
+        self.session = get_session('cmhk-stock', pool_maxsize=POLL_WORKERS, headers={
+            'User-Agent': USER_AGENT,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'zh-CN,zh;q=0.9'
+        })
+        logging.info("库存轮询会话创建成功")
+
+    def find_order_urls(self, html, page_url, products):
+        """
+        在产品组页面中查找各产品购买按钮的链接（cart.php?a=add&pid=...），页面只解析一次
+        找到的链接保存在产品的 order_url 中，找不到按钮时记录警告
+        """
+        soup = bs4.BeautifulSoup(html, 'html.parser')
+        for product in products:
+            buy_button = soup.find(id=product["order_button_id"])
+            href = buy_button.get("href") if buy_button else None
+            if not href:
+                # 每个产品只警告一次，避免每轮轮询重复输出
+                if not product.get("missing_button_warned"):
+                    logging.warning(f"产品组页面中未找到「{product['name']}」的购买按钮（{product['order_button_id']}）")
+                    product["missing_button_warned"] = True
+                continue
+            product["order_url"] = urljoin(page_url, href)
+
+    def is_in_stock(self, html):
+        """
+        解析购买链接返回的页面，判断产品是否有货
+        缺货时页面标题（header-lined）包含"缺货"，与浏览器购买流程中的判断一致
+        :param html: 购买链接返回的页面HTML
+        :return: 有货返回True
+        """
+        soup = bs4.BeautifulSoup(html, 'html.parser')
+        header = soup.find(class_="header-lined")
+        return not (header and self.out_of_stock_marker in header.get_text())
+
+    def fetch_page(self, url, timeout=5):
+        """通过HTTP会话获取产品页面，请求失败或需要登录时返回None"""
+        try:
+            response = self.session.get(url, timeout=timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logging.warning(f"第 {self.poll_count} 次库存检查请求失败（{url}）: {str(e)}")
+            return None
+        return response.text
+
+    def pending_products(self):
+        """返回尚未下单的产品"""
+        return [product for product in self.products if product["name"] not in self.purchased]
+
+    def poll_stock(self, executor):
+        """
+        通过共享的HTTP会话并发检查所有未下单产品的库存
+        先从产品组页面获取各产品的购买链接（只在首次或之前失败时获取），
+        然后请求购买链接，根据是否出现缺货页面判断库存
+        :param executor: 用于并发请求的线程池
+        :return: 有货的产品列表
+        """
+        self.poll_count += 1
+        products = self.pending_products()
+        # 丢弃上一轮产生的匿名WHMCS会话，避免匿名购物车不断累积
+        self.session.cookies.clear()
+
+        pages = {}
+        for product in products:
+            if not product.get("order_url"):
+                pages.setdefault(product["url"], []).append(product)
+        for url, html in zip(pages, executor.map(self.fetch_page, pages)):
+            if html is not None:
+                self.find_order_urls(html, url, pages[url])
+
+        def check_product(product):
+            html = self.fetch_page(product["order_url"])
+            in_stock = html is not None and self.is_in_stock(html)
+            logging.debug(f"第 {self.poll_count} 次库存检查「{product['name']}」: {'有货' if in_stock else '缺货'}")
+            return in_stock
+
+        targets = [product for product in products if product.get("order_url")]
+        return [product for product, in_stock in zip(targets, executor.map(check_product, targets)) if in_stock]
+
+    @contextmanager
+    def step(self, name, product=None):
+        """
+        记录一个购买步骤的耗时
+        每个步骤输出一条JSON格式的结构化日志，并累计到 self.step_timings 用于退出时汇总
+        """
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except exceptions.TimeoutException:
+            status = "timeout"
+            raise
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.step_timings.setdefault(name, []).append(elapsed_ms)
+            logging.info(json.dumps({
+                "event": "step",
+                "step": name,
+                "attempt": self.attempt_count,
+                "product": product["name"] if product else None,
+                "status": status,
+                "elapsed_ms": round(elapsed_ms, 1),
+                "lean": self.lean
+            }, ensure_ascii=False))
+
+    def summarize_timings(self):
+        """汇总各步骤耗时"""
+        if not self.step_timings:
+            return
+        logging.info(f"步骤耗时汇总（{'精简' if self.lean else '标准'}浏览器配置）:")
+        for name in STEPS:
+            timings = sorted(self.step_timings.get(name, []))
+            if not timings:
+                continue
+            logging.info(
+                f"  {name:<12} 次数={len(timings):<4} 平均={sum(timings) / len(timings):8.1f}ms "
+                f"中位={timings[len(timings) // 2]:8.1f}ms 最大={timings[-1]:8.1f}ms"
+            )
+
+    def click_checkbox(self, field_id, label):
+        """勾选页面上的自定义字段复选框（通过点击其后的iCheck样式元素）"""
+        checkbox = ui.WebDriverWait(self.driver, 5).until(
+            EC.presence_of_element_located((by.By.ID, field_id))
+        )
+        if not checkbox.is_selected():
+            # iCheck 样式元素由JS插入，eager加载策略下可能尚未生成
+            checkbox_label = ui.WebDriverWait(self.driver, 5).until(
+                lambda driver: checkbox.find_element(by.By.XPATH, "following-sibling::ins")
+            )
+            self.driver.execute_script("arguments[0].click();", checkbox_label)
+            logging.info(f"已勾选{label}")
+        else:
+            logging.info(f"{label}已经勾选")
+
+    def check_and_buy(self, product):
+        """
+        检查产品是否可购买并尝试购买
+        :param product: 要购买的产品（见 make_product）
+        """
         try:
             self.attempt_count += 1
-            logging.info(f"开始第 {self.attempt_count} 次尝试购买...")
-            
-            self.driver.get(self.target_url)
-            
-          
+            logging.info(f"开始第 {self.attempt_count} 次尝试购买「{product['name']}」...")
             
-            # 查找"立即购买"按钮
+            # 库存轮询已找到购买链接时直接打开，否则加载产品页面并查找"立即购买"按钮
             try:
-                buy_button = WebDriverWait(self.driver, 5).until(
-                    EC.presence_of_element_located((By.ID, "product1-order-button"))
-                )
-            except TimeoutException:
+                with self.step("page_load", product):
+                    if product.get("order_url"):
+                        self.driver.get(product["order_url"])
+                        buy_button = None
+                    else:
+                        self.driver.get(product["url"])
+                        buy_button = ui.WebDriverWait(self.driver, 5).until(
+                            EC.presence_of_element_located((by.By.ID, product["order_button_id"]))
+                        )
+            except exceptions.TimeoutException:
                 logging.error("未找到购买按钮")
                 return False
             
-            # 点击购买按钮
+            # 点击购买按钮（如需要），等待进入配置页面或出现缺货页面
             try:
-                buy_button.click()
-                logging.info("已点击购买按钮")
+                with self.step("buy_click", product):
+                    if buy_button is not None:
+                        buy_button.click()
+                        logging.info("已点击购买按钮")
+                    ui.WebDriverWait(self.driver, 5).until(EC.any_of(
+                        EC.presence_of_element_located((by.By.ID, "customfield6")),
+                        EC.text_to_be_present_in_element((by.By.CLASS_NAME, "header-lined"), "缺货")
+                    ))
+            except exceptions.TimeoutException:
+                logging.error("未找到配置页面元素")
+                return False
             except Exception as e:
                 logging.error(f"点击购买按钮失败: {str(e)}")
                 return False
-            
-            # 等待页面加载，检查是否成功
-            try:
-                # 首先检查是否出现缺货页面
-                try:
-                    time.sleep(1)
-                    WebDriverWait(self.driver, 2).until(
-                        EC.presence_of_element_located((By.CLASS_NAME, "header-lined"))
-                    )
-                    header_text = self.driver.find_element(By.CLASS_NAME, "header-lined").text
-                    if "缺货" in header_text:
-                        logging.info("产品缺货，准备点击返回按钮")
-                        try:
-                            # 查找并点击"返回并重试"按钮
-                            retry_button = WebDriverWait(self.driver, 5).until(
-                                EC.element_to_be_clickable((By.XPATH, "//a[contains(text(), '返回并重试')]"))
-                            )
-                            retry_button.click()
-                            logging.info("已点击返回按钮")
-                            time.sleep(3)
-                        except Exception as e:
-                            logging.error(f"点击返回按钮失败: {str(e)}")
-                        return False
-                except TimeoutException:
-                    pass
-
-                # 检查是否到了配置页面
+
+            # 检查是否出现缺货页面
+            if not self.driver.find_elements(by.By.ID, "customfield6"):
+                logging.info("产品缺货，准备点击返回按钮")
                 try:
-                    WebDriverWait(self.driver, 5).until(
-                        EC.presence_of_element_located((By.ID, "customfield6"))
+                    # 查找并点击"返回并重试"按钮，等待页面跳转
+                    retry_button = ui.WebDriverWait(self.driver, 5).until(
+                        EC.element_to_be_clickable((by.By.XPATH, "//a[contains(text(), '返回并重试')]"))
                     )
-                    # 勾选购买须知
-                    purchase_notice = self.driver.find_element(By.ID, "customfield6")
-                    # 检查是否已经勾选
-                    if not purchase_notice.is_selected():
-                        purchase_notice_label = purchase_notice.find_element(By.XPATH, "following-sibling::ins")
-                        self.driver.execute_script("arguments[0].click();", purchase_notice_label)
-                        logging.info("已勾选购买须知")
-                    else:
-                        logging.info("购买须知已经勾选")
-
-                    # 勾选法律法规
-                    legal_notice = self.driver.find_element(By.ID, "customfield7")
-                    # 检查是否已经勾选
-                    if not legal_notice.is_selected():
-                        legal_notice_label = legal_notice.find_element(By.XPATH, "following-sibling::ins")
-                        self.driver.execute_script("arguments[0].click();", legal_notice_label)
-                        logging.info("已勾选法律法规")
-                    else:
-                        logging.info("法律法规已经勾选")
+                    retry_button.click()
+                    ui.WebDriverWait(self.driver, 5).until(EC.staleness_of(retry_button))
+                    logging.info("已点击返回按钮")
+                except Exception as e:
+                    logging.error(f"点击返回按钮失败: {str(e)}")
+                return False
 
-                    # 点击继续按钮
-                    continue_button = WebDriverWait(self.driver, 5).until(
-                        EC.element_to_be_clickable((By.ID, "btnCompleteProductConfig"))
+            # 配置页面：勾选购买须知和法律法规，点击继续按钮
+            try:
+                with self.step("config_page", product):
+                    self.click_checkbox("customfield6", "购买须知")
+                    self.click_checkbox("customfield7", "法律法规")
+
+                    continue_button = ui.WebDriverWait(self.driver, 5).until(
+                        EC.element_to_be_clickable((by.By.ID, "btnCompleteProductConfig"))
                     )
                     continue_button.click()
                     logging.info("已点击继续按钮")
+            except exceptions.TimeoutException:
+                logging.error("未找到配置页面元素")
+                return False
+            except Exception as e:
+                logging.error(f"配置页面操作失败: {str(e)}")
+                return False
 
-                    # 等待页面加载完成
-                    time.sleep(1)
+            # 购物车页面：等待加载并点击结账按钮
+            try:
+                with self.step("cart", product):
+                    ui.WebDriverWait(self.driver, 5).until(
+                        EC.presence_of_element_located((by.By.CLASS_NAME, "view-cart-items"))
+                    )
+                    checkout_button = ui.WebDriverWait(self.driver, 5).until(
+                        EC.element_to_be_clickable((by.By.ID, "checkout"))
+                    )
+                    self.driver.execute_script("arguments[0].click();", checkout_button)
+                    logging.info("已点击结账按钮")
+            except exceptions.TimeoutException:
+                logging.error("未找到结账按钮")
+                return False
+            except Exception as e:
+                logging.error(f"点击结账按钮失败: {str(e)}")
+                return False
 
-                    # 等待并点击结账按钮
+            # 结账页面：等待提交订单按钮出现并点击
+            try:
+                with self.step("checkout", product):
+                    submit_button = ui.WebDriverWait(self.driver, 5).until(
+                        EC.element_to_be_clickable((by.By.ID, "btnCompleteOrder"))
+                    )
+                with self.step("submit", product):
+                    self.driver.execute_script("arguments[0].click();", submit_button)
+                    logging.info("已点击提交订单按钮")
+                    # 等待离开结账页面，计入订单提交的实际耗时；
+                    # 提交请求已经发出，超时也不能重新下单，只记录警告
                     try:
-                        # 首先等待购物车页面加载
-                        WebDriverWait(self.driver, 5).until(
-                            EC.presence_of_element_located((By.CLASS_NAME, "view-cart-items"))
-                        )
-                        
-                        checkout_button = WebDriverWait(self.driver, 5).until(
-                            EC.element_to_be_clickable((By.ID, "checkout"))
-                        )
-                        self.driver.execute_script("arguments[0].click();", checkout_button)
-                        logging.info("已点击结账按钮")
-                        
-                        # 等待结账页面加载
-                        try:
-                            # 等待结账页面标题加载
-                            WebDriverWait(self.driver, 5).until(
-                                EC.presence_of_element_located((By.CLASS_NAME, "header-lined"))
-                            )
-                            
-                            # 点击结账页面的提交按钮
-                            submit_button = WebDriverWait(self.driver, 5).until(
-                                EC.element_to_be_clickable((By.ID, "btnCompleteOrder"))
-                            )
-                            self.driver.execute_script("arguments[0].click();", submit_button)
-                            logging.info("已点击提交订单按钮")
-                            return True
-                        except TimeoutException:
-                            logging.error("未找到提交订单按钮")
-                            return False
-                        except Exception as e:
-                            logging.error(f"点击提交订单按钮失败: {str(e)}")
-                            return False
-
-                    except TimeoutException:
-                        logging.error("未找到结账按钮")
-                        return False
-                    except Exception as e:
-                        logging.error(f"点击结账按钮失败: {str(e)}")
-                        return False
-
-                except TimeoutException:
-                    logging.error("未找到配置页面元素")
-                    return False
-                except Exception as e:
-                    logging.error(f"配置页面操作失败: {str(e)}")
-                    return False
-
-            except TimeoutException:
-                logging.error("添加到购物车失败")
+                        ui.WebDriverWait(self.driver, 30).until(EC.staleness_of(submit_button))
+                    except exceptions.TimeoutException:
+                        logging.warning("提交订单后页面未跳转，请在浏览器中确认订单状态")
+                return True
+            except exceptions.TimeoutException:
+                logging.error("未找到提交订单按钮")
+                return False
+            except Exception as e:
+                logging.error(f"点击提交订单按钮失败: {str(e)}")
                 return False
                 
         except Exception as e:
@@ -230,42 +400,74 @@ class CMHKBuyer:
             return False
 
     def run(self, interval=1):
-        """运行抢购程序"""
+        """
+        运行抢购程序
+        先用共享的HTTP会话并发轮询所有产品的库存，浏览器预先启动并保持空闲，
+        检测到有货后才在浏览器中依次执行购买流程
+        每个下单成功的产品保留在各自的标签页中，后续购买在新标签页中进行
+        :param interval: 库存轮询间隔（秒）
+        """
+        executor = ThreadPoolExecutor(max_workers=POLL_WORKERS)
         try:
+            # 启动推送发件箱，投递上次运行遗留的消息
+            get_outbox()
+            self.setup_session()
             self.setup_driver()
             if not self.set_cookies():
                 raise Exception("设置Cookies失败")
             
             consecutive_errors = 0
-            while True:
-                logging.info("开始检查产品状态...")
-                try:
-                    if self.check_and_buy():
-                        logging.info("成功加入购物车！")
-                        # 成功后保持窗口打开，等待用户手动关闭
-                        sc_send("cmhk下单成功。请登录支付")
-                        input("请在完成操作后按回车键关闭浏览器...")
-                        break
-                    consecutive_errors = 0  # 重置连续错误计数
-                except Exception as e:
-                    consecutive_errors += 1
-                    logging.error(f"发生错误: {str(e)}")
-                    if consecutive_errors >= self.max_retries:
-                        logging.error(f"连续失败{self.max_retries}次，程序退出")
-                        # 失败后也保持窗口打开，等待用户手动关闭
-                        input("请在检查错误后按回车键关闭浏览器...")
-                        break
+            logging.info(f"开始轮询库存，监控产品: {[product['name'] for product in self.products]}")
+            while self.pending_products():
+                available = self.poll_stock(executor)
+                if not available:
+                    time.sleep(interval)
+                    continue
+
+                for product in available:
+                    logging.info(f"检测到「{product['name']}」有货，开始购买流程...")
+                    try:
+                        if self.check_and_buy(product):
+                            logging.info(f"「{product['name']}」下单成功！")
+                            self.purchased.add(product["name"])
+                            sc_enqueue(f"cmhk下单成功：{product['name']}。请登录支付")
+                            # 保留当前标签页供用户支付，后续购买使用新标签页
+                            if self.pending_products():
+                                self.driver.switch_to.new_window('tab')
+                        consecutive_errors = 0  # 重置连续错误计数
+                    except Exception as e:
+                        consecutive_errors += 1
+                        logging.error(f"发生错误: {str(e)}")
+                        if consecutive_errors >= self.max_retries:
+                            raise Exception(f"连续失败{self.max_retries}次，程序退出")
                 
                 time.sleep(interval)
+
+            # 全部下单后保持窗口打开，等待用户手动关闭
+            input("所有产品均已下单，请在完成操作后按回车键关闭浏览器...")
                 
         except Exception as e:
             logging.error(f"程序运行错误: {str(e)}")
             # 发生异常时也保持窗口打开，等待用户手动关闭
             input("请在检查错误后按回车键关闭浏览器...")
         finally:
+            executor.shutdown(wait=False)
+            self.summarize_timings()
             if self.driver:
                 self.driver.quit()
 
 if __name__ == "__main__":
-    buyer = CMHKBuyer()
-    buyer.run()
+    parser = argparse.ArgumentParser(description='CMHK产品抢购')
+    parser.add_argument('--product', action='append', type=parse_product, metavar='GID[:N]',
+                        help='要监控的产品，可重复指定，例如 --product 1 --product 2:3 '
+                             '表示 gid=1 的第1个产品和 gid=2 的第3个产品（默认: 1）')
+    parser.add_argument('--lean', action='store_true',
+                        help='使用精简浏览器配置（无头、eager加载、屏蔽图片和字体）')
+    parser.add_argument('--interval', type=float, default=1,
+                        help='库存轮询间隔秒数（默认: 1）')
+    args = parser.parse_args()
+
+    setup_logging('cmhk_buyer', log_dir='.')
+
+    buyer = CMHKBuyer(products=args.product, lean=args.lean)
+    buyer.run(interval=args.interval)
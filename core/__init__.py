@@ -0,0 +1,27 @@
+"""
+各脚本共用的基础模块：
+- lazy: 第三方依赖的延迟导入
+- config: 带缓存的 .env 配置读取
+- http: 按名称复用的连接池HTTP会话
+- log: 统一的日志配置
+
+子模块在首次访问对应名称时才导入，脚本只为用到的部分付出导入开销。
+"""
+import importlib
+
+_EXPORTS = {
+    'get_config': 'core.config',
+    'load_env': 'core.config',
+    'get_session': 'core.http',
+    'lazy_import': 'core.lazy',
+    'setup_logging': 'core.log',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'core' has no attribute '{name}'")
+    return getattr(importlib.import_module(module), name)
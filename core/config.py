@@ -0,0 +1,30 @@
+import os
+from functools import lru_cache
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_PATH = os.path.join(ROOT_DIR, '.env')
+
+
+@lru_cache(maxsize=None)
+def load_env(path=ENV_PATH):
+    """
+    读取 .env 文件（每个路径只读取一次）
+    :param path: .env 文件路径，默认为仓库根目录下的 .env
+    :return: 配置字典，文件不存在时返回空字典
+    """
+    data = {}
+    if not os.path.exists(path):
+        return data
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            data[key.strip()] = value.strip().strip('\'"')
+    return data
+
+
+def get_config(key, default=None):
+    """读取配置项，环境变量优先于 .env 文件"""
+    return os.environ.get(key) or load_env().get(key, default)
@@ -0,0 +1,48 @@
+import atexit
+import threading
+
+from core.lazy import lazy_import
+
+requests = lazy_import('requests')
+adapters = lazy_import('requests.adapters')
+
+_sessions = {}
+_session_args = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(name='default', headers=None, pool_maxsize=10):
+    """
+    获取按名称复用的HTTP会话（保持连接）
+    同名会话只创建一次，后续调用直接返回已有会话；会话在进程退出时统一关闭，调用方不应自行关闭
+    :param name: 会话名称，不同用途（不同cookies）应使用不同名称
+    :param headers: 创建会话时设置的默认请求头
+    :param pool_maxsize: 每个主机的最大连接数，应不小于并发请求数
+    :raises ValueError: 同名会话已用不同的参数创建
+    """
+    args = (dict(headers or {}), pool_maxsize)
+    with _sessions_lock:
+        session = _sessions.get(name)
+        if session is not None:
+            if _session_args[name] != args:
+                raise ValueError(f"会话 '{name}' 已使用不同的参数创建")
+            return session
+
+        session = requests.Session()
+        adapter = adapters.HTTPAdapter(pool_maxsize=pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(args[0])
+        _sessions[name] = session
+        _session_args[name] = args
+        return session
+
+
+@atexit.register
+def close_sessions():
+    """关闭所有会话"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _session_args.clear()
@@ -0,0 +1,28 @@
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    def __init__(self, name):
+        """
+        延迟加载的模块代理，首次访问属性时才真正导入
+        :param name: 模块的完整名称，例如 'selenium.webdriver'
+        """
+        super().__init__(name)
+
+    def _load(self):
+        try:
+            module = importlib.import_module(self.__name__)
+        except ImportError as e:
+            raise ImportError(f"缺少依赖 {self.__name__}，请执行 pip install -r requirements.txt") from e
+        # 缓存模块属性，之后的访问不再经过 __getattr__
+        self.__dict__.update(module.__dict__)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+def lazy_import(name):
+    """返回模块的延迟加载代理，用于推迟第三方依赖的导入开销"""
+    return LazyModule(name)
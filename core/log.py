@@ -0,0 +1,41 @@
+import logging
+import os
+from datetime import datetime
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def setup_logging(name, log_dir='logs', logger_name=None, level=logging.INFO, file_level=None):
+    """
+    配置日志：同时输出到控制台和带时间戳的日志文件
+    :param name: 日志文件名前缀，文件名为 {name}_{时间戳}.log
+    :param log_dir: 日志目录（不存在时自动创建）
+    :param logger_name: 要配置的日志记录器名称，为空时配置根记录器
+    :param level: 控制台日志级别
+    :param file_level: 文件日志级别，默认与控制台相同
+    :return: 配置好的日志记录器
+    """
+    logger = logging.getLogger(logger_name)
+    if getattr(logger, '_common_utils_configured', False):
+        return logger
+
+    file_level = level if file_level is None else file_level
+    os.makedirs(log_dir, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    log_file = os.path.join(log_dir, f'{name}_{timestamp}.log')
+
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    file_handler.setLevel(file_level)
+    file_handler.setFormatter(formatter)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(level)
+    console_handler.setFormatter(formatter)
+
+    logger.setLevel(min(level, file_level))
+    logger.addHandler(file_handler)
+    logger.addHandler(console_handler)
+    logger._common_utils_configured = True
+    return logger
@@ -1,14 +1,18 @@
+import atexit
+import json
+import logging
 import os
-import requests
 import re
+import sqlite3
+import threading
+import time
+
+from core import get_config, get_session
 
 def sc_send( title, desp='', options=None):
-    data = {}
-    with open(os.path.join(os.path.dirname(__file__), '.env'), 'r') as f:
-        for line in f:
-            key, value = line.strip().split('=')
-            data[key] = value
-    sendkey = data['SENDKEY']
+    sendkey = get_config('SENDKEY')
+    if not sendkey:
+        raise ValueError('SENDKEY is not configured in .env')
     
     if options is None:
         options = {}
@@ -30,7 +34,7 @@ def sc_send( title, desp='', options=None):
     headers = {
         'Content-Type': 'application/json;charset=utf-8'
     }
-    response = requests.post(url, json=params, headers=headers)
+    response = get_session('fangtang').post(url, json=params, headers=headers, timeout=10)
     result = response.json()
     return result
 
@@ -38,4 +42,264 @@ def sc_send( title, desp='', options=None):
 
 
 # ret = sc_send(key, '主人服务器宕机了 via python', '第一行\n\n第二行')
-# print(ret)
\ No newline at end of file
+# print(ret)
+
+
+# ---------------------------------------------------------------------------
+# 本地发件箱：消息先落盘到 SQLite，再由后台线程投递
+# ---------------------------------------------------------------------------
+
+OUTBOX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fangtang_outbox.db')
+DIGEST_MAX_LENGTH = 30000  # Server酱 desp 上限约 32KB，合并时留出余量
+IDLE_POLL_INTERVAL = 30.0  # 发件箱为空时检查其他进程写入消息的间隔（秒）
+ERROR_RETRY_INTERVAL = 10.0  # 投递线程出错（如数据库被锁）后的重试间隔（秒）
+
+
+class PushOutbox:
+    def __init__(self, db_path=OUTBOX_PATH, min_interval=60.0, digest_window=5.0,
+                 base_backoff=10.0, max_backoff=1800.0, claim_timeout=120.0, send_func=None):
+        """
+        初始化发件箱
+        多个进程可以共用同一个发件箱文件：投递前先在事务中认领消息，
+        上次推送时间也记录在数据库中，频率限制对所有进程共同生效
+        :param db_path: SQLite 发件箱文件路径
+        :param min_interval: 两次推送之间的最小间隔（秒），用于遵守推送服务的频率限制
+        :param digest_window: 收到新消息后等待的合并窗口（秒），窗口内的消息合并为一条摘要推送
+        :param base_backoff: 推送失败后的初始重试间隔（秒），之后按指数增长
+        :param max_backoff: 重试间隔上限（秒）
+        :param claim_timeout: 认领的有效期（秒），认领进程崩溃后消息在过期后可被重新投递
+        :param send_func: 实际的发送函数，默认为 sc_send
+        """
+        self.db_path = db_path
+        self.min_interval = min_interval
+        self.digest_window = digest_window
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.claim_timeout = claim_timeout
+        self.send_func = send_func or sc_send
+        self.owner = f"{os.getpid()}-{id(self)}"
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+        # 自动提交模式，事务由 BEGIN IMMEDIATE 显式控制
+        self._conn = sqlite3.connect(db_path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS outbox ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' title TEXT NOT NULL,'
+            ' desp TEXT NOT NULL,'
+            ' options TEXT NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' attempts INTEGER NOT NULL DEFAULT 0,'
+            ' next_attempt REAL NOT NULL,'
+            ' claimed_by TEXT,'
+            ' claimed_until REAL)'
+        )
+        # 兼容旧版本创建的发件箱文件
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(outbox)')}
+        for column, column_type in (('claimed_by', 'TEXT'), ('claimed_until', 'REAL')):
+            if column not in columns:
+                self._conn.execute(f'ALTER TABLE outbox ADD COLUMN {column} {column_type}')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS outbox_state (key TEXT PRIMARY KEY, value REAL NOT NULL)')
+
+    def enqueue(self, title, desp='', options=None):
+        """记录一条消息并立即返回，由后台线程负责投递"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO outbox (title, desp, options, created_at, next_attempt) VALUES (?, ?, ?, ?, ?)',
+                (title, desp, json.dumps(options or {}, sort_keys=True), now, now)
+            )
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def pending_count(self):
+        """返回尚未投递成功的消息数（包括其他进程正在投递的消息）"""
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def start(self):
+        """启动后台投递线程（重启后会继续投递上次遗留的消息）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='PushOutbox', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """停止后台投递线程，未投递的消息保留在发件箱中"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def flush(self, timeout=None):
+        """等待发件箱清空，超时返回 False"""
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending_count():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._wakeup.set()
+            time.sleep(0.2)
+        return True
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self._run_once()
+            except Exception as e:
+                # 数据库被锁、磁盘已满等错误不能让投递线程退出，否则后续消息无人投递
+                logging.error(f"推送发件箱投递出错，{ERROR_RETRY_INTERVAL:.0f} 秒后重试: {str(e)}", exc_info=True)
+                self._stopping.wait(ERROR_RETRY_INTERVAL)
+
+    def _run_once(self):
+        """执行一次等待或投递"""
+        delay = self._next_delay()
+        if delay is None:
+            # 发件箱为空，等待新消息；定期检查其他进程写入的消息
+            if self._wakeup.wait(IDLE_POLL_INTERVAL):
+                self._wakeup.clear()
+                # 给突发消息留出合并窗口
+                self._stopping.wait(self.digest_window)
+            return
+        if delay > 0:
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+            return
+        self._deliver_batch()
+
+    def _last_sent(self):
+        row = self._conn.execute("SELECT value FROM outbox_state WHERE key = 'last_sent'").fetchone()
+        return row[0] if row else 0.0
+
+    def _next_delay(self):
+        """距离下一次可以投递还需等待的秒数，发件箱为空时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT MIN(MAX(next_attempt, COALESCE(claimed_until, 0))) FROM outbox'
+            ).fetchone()
+            last_sent = self._last_sent()
+        if row[0] is None:
+            return None
+        now = time.time()
+        return max(row[0] - now, last_sent + self.min_interval - now, 0)
+
+    def _claim_batch(self):
+        """
+        在一个写事务中检查频率限制、选出要合并的消息并认领，同时记录推送时间
+        :return: 认领到的消息列表，当前不能投递时返回空列表
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                if now < self._last_sent() + self.min_interval:
+                    self._conn.execute('ROLLBACK')
+                    return []
+                rows = self._conn.execute(
+                    'SELECT id, title, desp, options, attempts FROM outbox'
+                    ' WHERE next_attempt <= ? AND (claimed_until IS NULL OR claimed_until < ?)'
+                    ' ORDER BY id',
+                    (now, now)
+                ).fetchall()
+
+                # 只合并推送选项相同的消息，其余留到下一轮
+                batch = []
+                length = 0
+                for row in rows:
+                    if row[3] != rows[0][3]:
+                        continue
+                    length += len(row[1]) + len(row[2])
+                    if batch and length > DIGEST_MAX_LENGTH:
+                        break
+                    batch.append(row)
+
+                if batch:
+                    self._conn.executemany(
+                        'UPDATE outbox SET claimed_by = ?, claimed_until = ? WHERE id = ?',
+                        [(self.owner, now + self.claim_timeout, row[0]) for row in batch]
+                    )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO outbox_state (key, value) VALUES ('last_sent', ?)", (now,)
+                    )
+                self._conn.execute('COMMIT')
+                return batch
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def _deliver_batch(self):
+        batch = self._claim_batch()
+        if not batch:
+            return
+
+        title, desp = self._build_digest(batch)
+        try:
+            result = self.send_func(title, desp, json.loads(batch[0][3]) or None)
+            if isinstance(result, dict) and result.get('code', 0) != 0:
+                raise RuntimeError(result.get('message') or result)
+        except Exception as e:
+            attempts = max(row[4] for row in batch) + 1
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+            logging.warning(f"推送失败（第 {attempts} 次），{backoff:.0f} 秒后重试: {str(e)}")
+            with self._lock:
+                self._conn.executemany(
+                    'UPDATE outbox SET attempts = attempts + 1, next_attempt = ?,'
+                    ' claimed_by = NULL, claimed_until = NULL WHERE id = ? AND claimed_by = ?',
+                    [(time.time() + backoff, row[0], self.owner) for row in batch]
+                )
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                'DELETE FROM outbox WHERE id = ? AND claimed_by = ?',
+                [(row[0], self.owner) for row in batch]
+            )
+
+    @staticmethod
+    def _build_digest(batch):
+        """将多条消息合并为一条摘要推送"""
+        if len(batch) == 1:
+            return batch[0][1], batch[0][2]
+        title = f"{batch[0][1]} 等{len(batch)}条通知"
+        sections = [f"### {row[1]}\n\n{row[2]}" for row in batch]
+        return title, '\n\n---\n\n'.join(sections)
+
+
+_default_outbox = None
+_default_outbox_lock = threading.Lock()
+
+
+def get_outbox():
+    """
+    获取默认发件箱（首次调用时创建并启动后台投递线程）
+    入口脚本应在启动时调用一次，以便尽快投递上次运行遗留的消息
+    """
+    global _default_outbox
+    with _default_outbox_lock:
+        if _default_outbox is None:
+            _default_outbox = PushOutbox()
+            _default_outbox.start()
+            atexit.register(_default_outbox.stop)
+        return _default_outbox
+
+
+def sc_enqueue(title, desp='', options=None):
+    """异步推送：消息写入本地发件箱后立即返回，不会因推送服务异常而丢失"""
+    return get_outbox().enqueue(title, desp, options)
+
+
+if __name__ == '__main__':
+    # 手动清空发件箱: python fangtang_push.py
+    outbox = get_outbox()
+    print(f"待投递消息: {outbox.pending_count()} 条")
+    if outbox.flush(timeout=300):
+        print("发件箱已清空")
+    else:
+        print(f"投递超时，仍有 {outbox.pending_count()} 条消息待投递，将在下次运行时继续")
@@ -1,11 +1,12 @@
-import requests
-from bs4 import BeautifulSoup
 import time
-import schedule
-from fangtang_push import sc_send
 import logging
-import os
-from datetime import datetime
+from core import get_session, lazy_import, setup_logging
+from fangtang_push import get_outbox, sc_enqueue
+
+bs4 = lazy_import('bs4')
+schedule = lazy_import('schedule')
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 
 class NodeseekMonitor:
     def __init__(self, keyword_groups, check_interval=30):
@@ -26,46 +27,18 @@ class NodeseekMonitor:
         self.logger.info(f"监控关键词组: {keyword_groups}")
 
     def setup_logging(self):
-        """设置日志记录"""
-        # 创建logs目录（如果不存在）
-        if not os.path.exists('logs'):
-            os.makedirs('logs')
-            
-        # 生成日志文件名，包含时间戳
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        log_file = os.path.join('logs', f'nodeseek_monitor_{timestamp}.log')
-        
-        # 配置日志记录器
-        self.logger = logging.getLogger('NodeseekMonitor')
-        self.logger.setLevel(logging.DEBUG)
-        
-        # 文件处理器
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setLevel(logging.DEBUG)
-        
-        # 控制台处理器
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        
-        # 设置日志格式
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(formatter)
-        console_handler.setFormatter(formatter)
-        
-        # 添加处理器
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        """设置日志记录（文件记录DEBUG级别，控制台输出INFO级别）"""
+        self.logger = setup_logging('nodeseek_monitor', log_dir='logs', logger_name='NodeseekMonitor',
+                                    level=logging.INFO, file_level=logging.DEBUG)
 
     def check_posts(self):
         try:
             self.logger.info("开始检查新帖子...")
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            response = requests.get(self.url, headers=headers)
+            session = get_session('nodeseek', headers={'User-Agent': USER_AGENT})
+            response = session.get(self.url, timeout=30)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = bs4.BeautifulSoup(response.text, 'html.parser')
             post_titles = soup.find_all(class_='post-title')
             self.logger.debug(f"获取到 {len(post_titles)} 个帖子标题")
             
@@ -96,7 +69,7 @@ class NodeseekMonitor:
                         self.logger.info(f"找到匹配！关键词组: {keywords_str}, 标题: {title}")
                         self.logger.info(f"发送通知: {message}")
                         
-                        sc_send(f"Nodeseek监控：匹配到「{keywords_str}」", message)
+                        sc_enqueue(f"Nodeseek监控：匹配到「{keywords_str}」", message)
                         self.seen_posts.add(post_id)
                         break
                         
@@ -109,11 +82,13 @@ class NodeseekMonitor:
         except Exception as e:
             error_message = f"监控过程中出现错误: {str(e)}"
             self.logger.error(error_message, exc_info=True)
-            # sc_send("Nodeseek监控错误", error_message)
+            # sc_enqueue("Nodeseek监控错误", error_message)
 
     def start(self):
         """启动监控"""
         self.logger.info("启动 Nodeseek 监控服务")
+        # 启动推送发件箱，投递上次运行遗留的消息
+        get_outbox()
         schedule.every(self.check_interval).seconds.do(self.check_posts)
         
         try:
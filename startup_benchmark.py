@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+测量各入口脚本的导入耗时（冷启动开销）
+
+使用方法:
+    python startup_benchmark.py                     # 只测量当前工作区
+    python startup_benchmark.py --baseline HEAD~1   # 与指定git版本对比
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ENTRY_POINTS = ['cmhk_buyer', 'nodeseek_monitor', 'fangtang_push', 'vmess_converter']
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_import(module, cwd, runs):
+    """
+    在独立的子进程中多次导入模块，返回导入耗时的中位数（毫秒）
+    导入失败时返回 None
+    """
+    code = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print((time.perf_counter() - start) * 1000)\n"
+    )
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', code], cwd=cwd,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def compile_tree(directory):
+    """
+    预先生成字节码缓存，使测量结果不受源码编译影响
+    （设置了 PYTHONDONTWRITEBYTECODE 时导入不会写入缓存，每次都会重新编译）
+    """
+    subprocess.run([sys.executable, '-m', 'compileall', '-q', directory],
+                   capture_output=True, check=True)
+
+
+def export_revision(revision, target_dir):
+    """将指定git版本的文件导出到目标目录"""
+    archive = subprocess.run(['git', 'archive', revision], cwd=ROOT_DIR,
+                             capture_output=True, check=True)
+    subprocess.run(['tar', '-x', '-C', target_dir], input=archive.stdout, check=True)
+
+
+def _format(value):
+    return '导入失败' if value is None else f"{value:.1f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测量各入口脚本的导入耗时')
+    parser.add_argument('--baseline', help='用于对比的git版本（例如 HEAD~1）')
+    parser.add_argument('--runs', type=int, default=5, help='每个模块的测量次数（默认: 5）')
+    args = parser.parse_args()
+
+    baseline_dir = None
+    if args.baseline:
+        baseline_dir = tempfile.mkdtemp(prefix='startup_baseline_')
+        export_revision(args.baseline, baseline_dir)
+        compile_tree(baseline_dir)
+    compile_tree(ROOT_DIR)
+
+    try:
+        if baseline_dir:
+            print(f"{'入口脚本':<20} {args.baseline:>12} {'当前':>12} {'变化':>10}")
+        else:
+            print(f"{'入口脚本':<20} {'导入耗时':>12}")
+
+        for module in ENTRY_POINTS:
+            current = measure_import(module, ROOT_DIR, args.runs)
+            if not baseline_dir:
+                print(f"{module:<24} {_format(current):>12}")
+                continue
+
+            before = measure_import(module, baseline_dir, args.runs)
+            change = ''
+            if before and current:
+                change = f"{(current - before) / before:+.0%}"
+            print(f"{module:<24} {_format(before):>12} {_format(current):>12} {change:>10}")
+    finally:
+        if baseline_dir:
+            shutil.rmtree(baseline_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+import asyncio
+import base64
+import io
+import json
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vmess_converter
+
+
+def closed_port():
+    """返回一个当前没有监听的本地端口"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def make_server_tls_context(directory):
+    """用openssl生成自签名证书，返回服务端TLS上下文"""
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-subj', '/CN=localhost', '-keyout', key, '-out', cert],
+                   check=True, capture_output=True)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+@unittest.skipIf(shutil.which('openssl') is None, 'openssl is required to create a test certificate')
+class ProbeNodesTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        async def accept_and_close(reader, writer):
+            writer.close()
+
+        async def accept_and_stay_silent(reader, writer):
+            # 接受TCP连接但从不响应TLS握手
+            await reader.read()
+            writer.close()
+
+        with tempfile.TemporaryDirectory() as directory:
+            tls_context = make_server_tls_context(directory)
+
+        self.plain_server = await asyncio.start_server(accept_and_close, '127.0.0.1', 0)
+        self.silent_server = await asyncio.start_server(accept_and_stay_silent, '127.0.0.1', 0)
+        self.tls_server = await asyncio.start_server(accept_and_stay_silent, '127.0.0.1', 0, ssl=tls_context)
+        self.plain_port = self.plain_server.sockets[0].getsockname()[1]
+        self.silent_port = self.silent_server.sockets[0].getsockname()[1]
+        self.tls_port = self.tls_server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        for server in (self.plain_server, self.silent_server, self.tls_server):
+            server.close()
+            await server.wait_closed()
+
+    async def test_ranks_local_listeners(self):
+        configs = [
+            {'ps': 'closed', 'add': '127.0.0.1', 'port': closed_port(), 'tls': 'none'},
+            {'ps': 'silent-tls', 'add': '127.0.0.1', 'port': self.silent_port, 'tls': 'tls'},
+            {'ps': 'bad-port', 'add': '127.0.0.1', 'port': 'abc', 'tls': 'none'},
+            {'ps': 'plain', 'add': '127.0.0.1', 'port': str(self.plain_port), 'tls': ''},
+            {'ps': 'tls', 'add': '127.0.0.1', 'port': self.tls_port, 'tls': 'tls', 'sni': 'localhost'},
+        ]
+        results = await asyncio.wait_for(
+            vmess_converter.probe_nodes(configs, repeat=2, timeout=0.5), timeout=10
+        )
+
+        reachable = {r['config']['ps']: r for r in results[:2]}
+        self.assertEqual(set(reachable), {'plain', 'tls'})
+        for result in reachable.values():
+            self.assertEqual(result['loss'], 0)
+            self.assertIsNotNone(result['p50'])
+        self.assertIsNone(reachable['plain']['tls_p50'])
+        self.assertIsNotNone(reachable['tls']['tls_p50'])
+        self.assertGreaterEqual(reachable['tls']['p50'], reachable['tls']['tls_p50'])
+
+        self.assertEqual({r['config']['ps'] for r in results[2:]}, {'closed', 'silent-tls', 'bad-port'})
+        for result in results[2:]:
+            self.assertEqual(result['loss'], 1)
+            self.assertIsNone(result['p50'])
+
+
+class SubscriptionTest(unittest.TestCase):
+    def setUp(self):
+        # 缩小读取块，使base64的3/4字节余量跨越多个读取边界
+        self.read_size = vmess_converter.READ_SIZE
+        vmess_converter.READ_SIZE = 7
+
+    def tearDown(self):
+        vmess_converter.READ_SIZE = self.read_size
+
+    def make_links(self, count=50):
+        return [vmess_converter.encode_vmess_url({'ps': f'节点{i}', 'add': 'a.example', 'port': '443', 'tls': ''})
+                for i in range(count)] + ['ss://plain-link']
+
+    def convert(self, data, rules, output_format='auto'):
+        output = io.BytesIO()
+        stats = vmess_converter.convert_subscription(io.BytesIO(data), output, rules,
+                                                     chunk_size=3, output_format=output_format)
+        return output.getvalue(), stats
+
+    def test_base64_round_trip_across_read_boundaries(self):
+        links = self.make_links()
+        encoded = base64.b64encode('\n'.join(links).encode('utf-8'))
+        # 订阅常见的换行包装和缺失填充
+        wrapped = b'\n'.join(encoded[i:i + 76] for i in range(0, len(encoded), 76)).rstrip(b'=')
+
+        output, stats = self.convert(wrapped, [])
+
+        self.assertEqual(stats, {'total': len(links), 'rewritten': 0, 'invalid': 0})
+        self.assertEqual(base64.b64decode(output).decode('utf-8').splitlines(), links)
+
+    def test_plain_input_is_detected_and_rewritten(self):
+        links = self.make_links()
+        rules = vmess_converter.load_rules(port=8443)
+
+        output, stats = self.convert('\r\n'.join(links).encode('utf-8'), rules)
+
+        self.assertEqual(stats['rewritten'], len(links) - 1)
+        lines = output.decode('utf-8').splitlines()
+        self.assertEqual(lines[-1], 'ss://plain-link')
+        self.assertEqual(vmess_converter.decode_vmess_url(lines[0])['port'], '8443')
+
+    def test_urlsafe_unpadded_link_is_rewritten(self):
+        config = {'ps': '>>>?', 'add': 'a.example', 'port': 80}
+        payload = base64.urlsafe_b64encode(json.dumps(config).encode('utf-8')).rstrip(b'=')
+        self.assertIn(b'_', payload)
+        link = b'vmess://' + payload
+
+        output, stats = self.convert(link, vmess_converter.load_rules(add='b.example'), 'plain')
+
+        self.assertEqual(stats, {'total': 1, 'rewritten': 1, 'invalid': 0})
+        self.assertEqual(vmess_converter.decode_vmess_url(output.decode('utf-8').strip())['add'], 'b.example')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,19 +2,24 @@ import base64
 import json
 import sys
 
+# 批量和探测模式用到的其他模块（argparse、re、asyncio、ssl 等）在函数内导入，保持单链接模式启动迅速
+
 def decode_vmess_url(vmess_url):
     """解码vmess URL并返回配置字典"""
     if not vmess_url.startswith('vmess://'):
         raise ValueError("Invalid vmess URL")
     
-    # 移除 'vmess://' 前缀并解码base64
-    encoded_config = vmess_url[8:]
+    # 移除 'vmess://' 前缀并解码base64（兼容URL安全字符和缺失的填充）
+    encoded_config = vmess_url[8:].strip().replace('-', '+').replace('_', '/').rstrip('=')
+    encoded_config += '=' * (-len(encoded_config) % 4)
     try:
         config_str = base64.b64decode(encoded_config).decode('utf-8')
         config = json.loads(config_str)
-        return config
     except Exception as e:
         raise ValueError(f"Failed to decode vmess URL: {str(e)}")
+    if not isinstance(config, dict):
+        raise ValueError("Failed to decode vmess URL: config is not a JSON object")
+    return config
 
 def encode_vmess_url(config):
     """将配置字典编码为vmess URL"""
@@ -22,14 +27,476 @@ def encode_vmess_url(config):
     encoded_config = base64.b64encode(config_str.encode('utf-8')).decode('utf-8')
     return f"vmess://{encoded_config}"
 
+def normalize_tls(value):
+    """将用户输入的TLS设置规范化为 'tls' 或 'none'，无效时返回 None"""
+    value = value.strip().lower()
+    if value in ['true', 'tls']:
+        return 'tls'
+    if value in ['false', 'none']:
+        return 'none'
+    return None
+
 def display_config(config):
     """显示配置的详细信息"""
     # 输出config 所有字段
     print(f"{json.dumps(config, indent=4)}")
 
+# ---------------------------------------------------------------------------
+# 批量订阅转换
+# ---------------------------------------------------------------------------
+
+CHUNK_SIZE = 1000       # 每个子进程任务处理的链接数
+READ_SIZE = 64 * 1024   # 每次从输入读取的字节数
+DETECT_SIZE = 64         # 判断订阅格式所需的最少字节数
+SCHEME_PATTERN = rb'\s*[A-Za-z][A-Za-z0-9+.-]*://'
+
+def load_rules(rules_file=None, match=None, add=None, port=None, tls=None):
+    """
+    加载改写规则
+    :param rules_file: JSON规则文件，内容为规则列表，例如:
+                       [{"match": "香港", "add": "1.2.3.4", "port": 443, "tls": "tls"}]
+    :param match: 命令行规则的匹配正则（匹配备注 ps 或地址 add），为空时匹配所有节点
+    :param add/port/tls: 命令行规则要改写的字段
+    :return: 规则列表
+    """
+    import re
+
+    rules = []
+    if rules_file:
+        with open(rules_file, 'r', encoding='utf-8') as f:
+            rules.extend(json.load(f))
+    if add is not None or port is not None or tls is not None:
+        rules.append({'match': match, 'add': add, 'port': port, 'tls': tls})
+
+    for rule in rules:
+        if rule.get('match'):
+            re.compile(rule['match'])
+        if rule.get('port') is not None:
+            rule['port'] = int(rule['port'])
+        if rule.get('tls') is not None:
+            tls_value = normalize_tls(str(rule['tls']))
+            if tls_value is None:
+                raise ValueError(f"无效的TLS设置: {rule['tls']}")
+            rule['tls'] = tls_value
+    return rules
+
+def apply_rules(config, rules):
+    """按顺序对配置应用所有匹配的规则，返回配置是否被修改"""
+    import re
+
+    changed = False
+    for rule in rules:
+        pattern = rule.get('match')
+        if pattern and not (re.search(pattern, str(config.get('ps', '')))
+                            or re.search(pattern, str(config.get('add', '')))):
+            continue
+        for key in ('add', 'port', 'tls'):
+            value = rule.get(key)
+            if value is None or str(config.get(key)) == str(value):
+                continue
+            # 保持原字段类型，例如端口常以字符串 "443" 保存
+            config[key] = str(value) if isinstance(config.get(key), str) else value
+            changed = True
+    return changed
+
+def rewrite_chunk(lines, rules):
+    """
+    改写一批订阅链接（在子进程中执行）
+    非vmess链接和无法解码的链接原样保留
+    :return: (改写后的链接列表, 统计信息)
+    """
+    output = []
+    stats = {'total': 0, 'rewritten': 0, 'invalid': 0}
+    for line in lines:
+        stats['total'] += 1
+        if not line.startswith('vmess://'):
+            output.append(line)
+            continue
+        try:
+            config = decode_vmess_url(line)
+        except ValueError:
+            stats['invalid'] += 1
+            output.append(line)
+            continue
+        if apply_rules(config, rules):
+            stats['rewritten'] += 1
+            output.append(encode_vmess_url(config))
+        else:
+            output.append(line)
+    return output, stats
+
+def _iter_base64_bytes(first, stream):
+    """流式解码base64（兼容换行、URL安全字符和缺失的填充）"""
+    pending = b''
+    chunk = first
+    while chunk:
+        pending += b''.join(chunk.split()).translate(bytes.maketrans(b'-_', b'+/'))
+        usable = len(pending) // 4 * 4
+        if usable:
+            yield base64.b64decode(pending[:usable])
+            pending = pending[usable:]
+        chunk = stream.read(READ_SIZE)
+    pending = pending.rstrip(b'=')
+    if len(pending) % 4 == 1:
+        raise ValueError("订阅内容不是有效的base64")
+    if pending:
+        yield base64.b64decode(pending + b'=' * (-len(pending) % 4))
+
+def _iter_plain_bytes(first, stream):
+    chunk = first
+    while chunk:
+        yield chunk
+        chunk = stream.read(READ_SIZE)
+
+def _iter_lines(byte_chunks):
+    """将字节块切分为非空文本行"""
+    tail = b''
+    for chunk in byte_chunks:
+        tail += chunk
+        *lines, tail = tail.split(b'\n')
+        for line in lines:
+            line = line.strip().decode('utf-8')
+            if line:
+                yield line
+    tail = tail.strip().decode('utf-8')
+    if tail:
+        yield tail
+
+def open_subscription(stream):
+    """
+    打开订阅流，自动识别base64包装或纯文本格式
+    :param stream: 二进制输入流
+    :return: (是否为base64格式, 链接迭代器)
+    """
+    import re
+
+    # 读取到足够判断格式的内容（短读取时继续读取）
+    first = b''
+    while True:
+        chunk = stream.read(READ_SIZE)
+        first += chunk
+        if not chunk or len(first.lstrip()) >= DETECT_SIZE:
+            break
+    if not first.strip() or re.match(SCHEME_PATTERN, first):
+        return False, _iter_lines(_iter_plain_bytes(first, stream))
+    return True, _iter_lines(_iter_base64_bytes(first, stream))
+
+class SubscriptionWriter:
+    def __init__(self, stream, use_base64):
+        """
+        订阅输出流
+        :param stream: 二进制输出流
+        :param use_base64: 是否输出base64包装的订阅
+        """
+        self.stream = stream
+        self.use_base64 = use_base64
+        self.pending = b''
+
+    def write_lines(self, lines):
+        data = ''.join(f"{line}\n" for line in lines).encode('utf-8')
+        if not self.use_base64:
+            self.stream.write(data)
+            return
+        # 只编码3字节的整数倍，保证分块输出与整体编码结果一致
+        self.pending += data
+        usable = len(self.pending) // 3 * 3
+        self.stream.write(base64.b64encode(self.pending[:usable]))
+        self.pending = self.pending[usable:]
+
+    def close(self):
+        if self.use_base64 and self.pending:
+            self.stream.write(base64.b64encode(self.pending))
+        self.pending = b''
+        self.stream.flush()
+
+def iter_chunks(lines, chunk_size):
+    """将链接迭代器切分为固定大小的批次"""
+    from itertools import islice
+
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def map_chunks(chunks, rules, workers):
+    """
+    使用进程池按顺序改写各批次
+    同时在途的批次数有上限，内存占用与订阅大小无关
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield rewrite_chunk(chunk, rules)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = []
+        for chunk in chunks:
+            in_flight.append(executor.submit(rewrite_chunk, chunk, rules))
+            if len(in_flight) >= workers * 2:
+                yield in_flight.pop(0).result()
+        for future in in_flight:
+            yield future.result()
+
+def convert_subscription(input_stream, output_stream, rules, workers=1,
+                         chunk_size=CHUNK_SIZE, output_format='auto'):
+    """
+    流式改写整个订阅
+    :param input_stream: 二进制输入流
+    :param output_stream: 二进制输出流
+    :param rules: 改写规则，见 load_rules
+    :param workers: 进程数
+    :param chunk_size: 每批链接数
+    :param output_format: 输出格式 auto（与输入一致）/base64/plain
+    :return: 统计信息
+    """
+    is_base64, lines = open_subscription(input_stream)
+    use_base64 = is_base64 if output_format == 'auto' else output_format == 'base64'
+    writer = SubscriptionWriter(output_stream, use_base64)
+
+    totals = {'total': 0, 'rewritten': 0, 'invalid': 0}
+    for output, stats in map_chunks(iter_chunks(lines, chunk_size), rules, workers):
+        writer.write_lines(output)
+        for key in totals:
+            totals[key] += stats[key]
+    writer.close()
+    return totals
+
+def bulk_main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='vmess_converter.py bulk',
+        description='批量改写订阅中的vmess节点（支持base64包装或纯文本订阅）'
+    )
+    parser.add_argument('-i', '--input', help='输入订阅文件（默认读取标准输入）')
+    parser.add_argument('-o', '--output', help='输出订阅文件（默认写入标准输出）')
+    parser.add_argument('--rules', help='JSON规则文件')
+    parser.add_argument('--match', help='匹配节点备注或地址的正则（默认匹配所有节点）')
+    parser.add_argument('--add', help='新IP地址')
+    parser.add_argument('--port', type=int, help='新端口')
+    parser.add_argument('--tls', help='TLS设置 (true/tls/false/none)')
+    parser.add_argument('--workers', type=int, default=1, help='进程数（默认: 1）')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help=f'每批处理的链接数（默认: {CHUNK_SIZE}）')
+    parser.add_argument('--format', choices=['auto', 'base64', 'plain'], default='auto',
+                        help='输出格式（默认与输入一致）')
+    args = parser.parse_args(argv)
+
+    try:
+        rules = load_rules(args.rules, args.match, args.add, args.port, args.tls)
+        if not rules:
+            parser.error("请通过 --rules 或 --add/--port/--tls 指定至少一条改写规则")
+
+        input_stream = open(args.input, 'rb') if args.input else sys.stdin.buffer
+        output_stream = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        try:
+            stats = convert_subscription(input_stream, output_stream, rules,
+                                         workers=args.workers, chunk_size=args.chunk_size,
+                                         output_format=args.format)
+        finally:
+            if args.input:
+                input_stream.close()
+            if args.output:
+                output_stream.close()
+    except (OSError, ValueError) as e:
+        print(f"错误: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"处理完成: 共 {stats['total']} 个节点，改写 {stats['rewritten']} 个，"
+          f"无法解码 {stats['invalid']} 个", file=sys.stderr)
+
+# ---------------------------------------------------------------------------
+# 节点延迟探测与排序
+# ---------------------------------------------------------------------------
+
+def percentile(values, pct):
+    """返回已排序列表的百分位数（最近秩法），列表为空时返回 None"""
+    import math
+
+    if not values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+def insecure_tls_context():
+    """
+    创建探测用的TLS上下文
+    探测只关心握手耗时，不校验证书，也就不需要加载CA证书；
+    每轮探测只创建一次，避免在事件循环中重复加载拖慢其他探测
+    """
+    import ssl
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+async def probe_once(host, port, use_tls=False, server_name=None, timeout=3.0, tls_context=None):
+    """
+    对目标进行一次TCP连接（以及可选的TLS握手）
+    :param tls_context: 握手使用的TLS上下文，默认为 insecure_tls_context()
+    :return: (TCP连接耗时, TLS握手耗时或 None)，单位秒
+    """
+    import asyncio
+    import time
+
+    # 探测不读写数据，直接使用底层传输和空协议（loop.start_tls 在 Python 3.7+ 可用）
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    transport, protocol = await asyncio.wait_for(
+        loop.create_connection(asyncio.Protocol, host, port), timeout
+    )
+    try:
+        tcp_time = time.perf_counter() - start
+        tls_time = None
+        if use_tls:
+            start = time.perf_counter()
+            transport = await asyncio.wait_for(
+                loop.start_tls(transport, protocol, tls_context or insecure_tls_context(),
+                               server_hostname=server_name or host),
+                timeout
+            )
+            tls_time = time.perf_counter() - start
+    finally:
+        # 直接中止连接：对端不响应TLS时优雅关闭会一直等待
+        transport.abort()
+    return tcp_time, tls_time
+
+async def probe_node(config, repeat=3, timeout=3.0, semaphore=None, tls_context=None):
+    """
+    对单个解码后的节点配置进行多次探测
+    :param config: decode_vmess_url 返回的配置（使用 add/port/tls/sni/host 字段）
+    :param repeat: 探测次数
+    :param timeout: 单次连接和握手的超时（秒）
+    :param semaphore: 限制全局并发连接数
+    :param tls_context: 握手使用的TLS上下文
+    :return: 探测结果字典，端口无效的节点丢包率为100%
+    """
+    import asyncio
+    import ssl
+
+    host = str(config.get('add', ''))
+    use_tls = config.get('tls') == 'tls'
+    server_name = config.get('sni') or config.get('host') or host
+    semaphore = semaphore or asyncio.Semaphore(1)
+    try:
+        port = int(config.get('port', 0))
+    except (TypeError, ValueError):
+        port = None
+
+    tcp_times, tls_times, totals = [], [], []
+    for _ in range(repeat if port is not None else 0):
+        async with semaphore:
+            try:
+                tcp_time, tls_time = await probe_once(host, port, use_tls, server_name, timeout, tls_context)
+            except (OSError, asyncio.TimeoutError, ssl.SSLError, ValueError, OverflowError):
+                continue
+        tcp_times.append(tcp_time)
+        if tls_time is not None:
+            tls_times.append(tls_time)
+        totals.append(tcp_time + (tls_time or 0))
+
+    tcp_times.sort()
+    tls_times.sort()
+    totals.sort()
+    return {
+        'config': config,
+        'tcp_p50': percentile(tcp_times, 50),
+        'tls_p50': percentile(tls_times, 50),
+        'p50': percentile(totals, 50),
+        'p95': percentile(totals, 95),
+        'loss': 1 - len(totals) / repeat if repeat else 1.0,
+    }
+
+async def probe_nodes(configs, repeat=3, timeout=3.0, concurrency=100):
+    """
+    并发探测所有节点并按丢包率、p50延迟排序
+    :param configs: 解码后的节点配置列表
+    :param concurrency: 同时进行的最大连接数
+    :return: 排好序的探测结果列表
+    """
+    import asyncio
+
+    semaphore = asyncio.Semaphore(concurrency)
+    tls_context = insecure_tls_context()
+    results = await asyncio.gather(
+        *(probe_node(config, repeat, timeout, semaphore, tls_context) for config in configs)
+    )
+    return sorted(results, key=lambda r: (r['loss'], r['p50'] if r['p50'] is not None else float('inf')))
+
+def _ms(value):
+    return '-' if value is None else f"{value * 1000:.1f}"
+
+def print_ranking(results):
+    """输出排名表"""
+    print(f"{'排名':<4} {'p50(ms)':>9} {'p95(ms)':>9} {'TCP(ms)':>9} {'TLS(ms)':>9} {'丢包':>6}  节点")
+    for i, result in enumerate(results, 1):
+        config = result['config']
+        print(f"{i:<6} {_ms(result['p50']):>9} {_ms(result['p95']):>9} "
+              f"{_ms(result['tcp_p50']):>9} {_ms(result['tls_p50']):>9} "
+              f"{result['loss']:>6.0%}  {config.get('add')}:{config.get('port')} {config.get('ps', '')}")
+
+def probe_main(argv):
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(
+        prog='vmess_converter.py probe',
+        description='并发探测订阅中vmess节点的TCP连接和TLS握手延迟，并按延迟排序'
+    )
+    parser.add_argument('-i', '--input', help='输入订阅文件（默认读取标准输入）')
+    parser.add_argument('-o', '--output', help='输出按延迟排序的订阅文件（不含完全不可达的节点）')
+    parser.add_argument('--repeat', type=int, default=3, help='每个节点的探测次数（默认: 3）')
+    parser.add_argument('--timeout', type=float, default=3.0, help='单次探测超时秒数（默认: 3）')
+    parser.add_argument('--concurrency', type=int, default=100, help='最大并发连接数（默认: 100）')
+    parser.add_argument('--format', choices=['auto', 'base64', 'plain'], default='auto',
+                        help='输出订阅格式（默认与输入一致）')
+    args = parser.parse_args(argv)
+
+    try:
+        input_stream = open(args.input, 'rb') if args.input else sys.stdin.buffer
+        try:
+            is_base64, lines = open_subscription(input_stream)
+            configs = []
+            for line in lines:
+                if not line.startswith('vmess://'):
+                    continue
+                try:
+                    configs.append(decode_vmess_url(line))
+                except ValueError:
+                    continue
+        finally:
+            if args.input:
+                input_stream.close()
+
+        results = asyncio.run(probe_nodes(configs, args.repeat, args.timeout, args.concurrency))
+        print_ranking(results)
+
+        if args.output:
+            use_base64 = is_base64 if args.format == 'auto' else args.format == 'base64'
+            with open(args.output, 'wb') as f:
+                writer = SubscriptionWriter(f, use_base64)
+                writer.write_lines(encode_vmess_url(r['config']) for r in results if r['loss'] < 1)
+                writer.close()
+    except (OSError, ValueError) as e:
+        print(f"错误: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'bulk':
+        bulk_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'probe':
+        probe_main(sys.argv[2:])
+        return
+
     if len(sys.argv) != 2:
         print("使用方法: python vmess_converter.py <vmess_url>")
+        print("批量模式: python vmess_converter.py bulk --help")
+        print("延迟探测: python vmess_converter.py probe --help")
         sys.exit(1)
 
     vmess_url = sys.argv[1]
@@ -51,10 +518,8 @@ def main():
         if new_port:
             config['port'] = int(new_port)
         if new_tls:
-            if new_tls in ['true', 'tls']:
-                config['tls'] = 'tls'
-            elif new_tls in ['false', 'none']:
-                config['tls'] = 'none'
+            if normalize_tls(new_tls):
+                config['tls'] = normalize_tls(new_tls)
             else:
                 print(f"警告: 无效的TLS设置 '{new_tls}'，将保持原值")
         